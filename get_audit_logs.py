@@ -1,23 +1,73 @@
 import argparse
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import importlib.util
+from contextlib import nullcontext
 from dotenv import load_dotenv
 import json
 import logging
 import os
+import queue
+import random
 import requests
+import sys
+import tempfile
+import threading
+from requests.adapters import HTTPAdapter
 import time
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Generator
-from requests.exceptions import ConnectionError, Timeout, RequestException
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from itertools import takewhile
+from typing import Optional, Dict, Any, Callable, Generator, AsyncGenerator, Iterable, List, Union
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError, Timeout
+from urllib3.exceptions import DecodeError, ProtocolError
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # httpx is only needed for the async API
+    httpx = None
+# httpx only multiplexes requests over HTTP/2 when the h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib JSON parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is only needed for streamed parsing
+    ijson = None
 
 VERKADA_ENVIRONMENT_VARIABLE_API_KEY = "VERKADA_API_KEY"
 DEFAULT_BASE_URL = "https://api.au.verkada.com"
+TOKEN_URL = f"{DEFAULT_BASE_URL}/token"
+AUDIT_LOG_URL = f"{DEFAULT_BASE_URL}/core/v1/audit_log"
+NOTIFICATIONS_URL = f"{DEFAULT_BASE_URL}/cameras/v1/alerts"
 DEFAULT_SESSION_TIMEOUT = 30
 DEFAULT_PAGE_SIZE = 100
-DEFAULT_TOKEN_EXPIRATION_TIME = 25  # 25 minutes
-RETRY_WAIT_TIME = 10
-MAX_RETRIES = 3
-INTERESTED_EVENTS = ['Archive Action Taken', 'Video History Streamed', 'Live Stream Started']
+DEFAULT_HEADERS = {"Content-Type": "application/json"}
+HTTP_POOL_CONNECTIONS = 4  # Number of per-host pools, every request goes to one API host
+HTTP_POOL_MAXSIZE = 32
+TOKEN_VALID_SECONDS = 30 * 60  # API tokens are valid for 30 minutes
+TOKEN_REFRESH_MARGIN = 60  # Refresh tokens this many seconds before they expire
+TOKEN_FILE = 'token.json'
+RETRY_BACKOFF_BASE = 1.0  # Initial backoff in seconds, doubled on each retry
+RETRY_BACKOFF_MAX = 30  # Upper bound for a single backoff in seconds
+MAX_RETRIES = 6
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+INTERESTED_EVENTS = frozenset({'Archive Action Taken', 'Video History Streamed', 'Live Stream Started'})
 CRON_INTERVAL_MINUTES = 15  # Interval in minutes for cron job execution
+ASYNC_MAX_CONNECTIONS = 100
+ASYNC_MAX_KEEPALIVE_CONNECTIONS = 20
+ASYNC_MAX_CONCURRENCY = 8  # Maximum number of in-flight page requests
+DEFAULT_MAX_WORKERS = 8  # Threads used for parallel page requests
+SHARD_MIN_SECONDS = 60 * 60  # Shortest time sub-range worth its own concurrent page chain
+SHARD_BUFFERED_PAGES = 2  # Pages each concurrent sub-range may fetch ahead of the consumer
 
 load_dotenv()
 # Set up logging
@@ -26,10 +76,175 @@ logger = logging.getLogger(__name__)
 
 
 def clean_params(params):
-    """Remove keys with None values"""
+    """Remove keys with None values, returning `params` itself if there are none"""
+    if None not in params.values():
+        return params
     return {k: v for k, v in params.items() if v is not None}
 
 
+def event_filter(event_names):
+    """
+    Predicate keeping audit logs whose event_name is in `event_names`,
+    or None to keep every audit log if `event_names` is None
+    """
+    if event_names is None:
+        return None
+    event_names = frozenset(event_names)
+    return lambda audit_log: audit_log['event_name'] in event_names
+
+
+def parse_json(response):
+    """Decode a JSON response body, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def dump_json(obj):
+    """
+    Serialize `obj` as indented UTF-8 JSON bytes, using orjson when it is installed.
+    The two encoders format some floats differently (orjson writes 1e20 and
+    null for NaN, json writes 1e+20 and NaN), so output can differ between installs.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+
+
+def iter_json_items(stream, key):
+    """
+    Incrementally parse a paginated JSON body from a file-like `stream`,
+    yielding each element of the top-level `key` array as soon as it is
+    complete. Returns the body's next_page_token.
+    """
+    if ijson is None:
+        raise ImportError("ijson is required for streamed parsing: pip install ijson")
+    item_prefix = f"{key}.item"
+    next_page_token = None
+    builder = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == item_prefix and event in ('end_map', 'end_array'):
+                yield builder.value
+                builder = None
+        elif prefix == item_prefix:
+            if event in ('start_map', 'start_array'):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            else:
+                yield value
+        elif prefix == 'next_page_token':
+            next_page_token = value
+    return next_page_token
+
+
+def jwt_expiry(token):
+    """Read the exp claim of a JWT without verifying it, or None if it has none"""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return int(claims['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_time(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (starting at 1): the server's
+    Retry-After if given, otherwise capped exponential backoff with full jitter
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def split_time_range(start_time, end_time, parts):
+    """
+    Split [start_time, end_time] into at most `parts` consecutive sub-ranges
+    of at least SHARD_MIN_SECONDS each, so short ranges stay a single query.
+    Like consecutive cron windows, neighbouring sub-ranges share their
+    boundary second: nothing falls between them whether the API treats
+    end_time as inclusive or exclusive, and records returned on both sides
+    of a boundary are dropped with SubRangeDeduplicator.
+    """
+    parts = max(1, min(parts, (end_time - start_time) // SHARD_MIN_SECONDS))
+    step = (end_time - start_time) / parts
+    bounds = [start_time + int(i * step) for i in range(parts)] + [end_time]
+    return list(zip(bounds, bounds[1:]))
+
+
+def record_second(value):
+    """
+    Whole Unix second of a record time given as Unix seconds or an ISO 8601
+    string (UTC unless it has an offset), or None if it is neither
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            time_dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if time_dt.tzinfo is None:
+            time_dt = time_dt.replace(tzinfo=timezone.utc)
+        return int(time_dt.timestamp())
+    return None
+
+
+class SubRangeDeduplicator:
+    """
+    Filter for records of the sub-range query params from split_time_range(),
+    consumed in ascending order, dropping those the previous sub-range
+    already returned at the boundary second they share. Only records whose
+    `time_key` falls in a boundary second are hashed and remembered; without
+    a `time_key`, or for records whose time cannot be read, every record is.
+    Call next_range() before each sub-range, including the first.
+    """
+
+    def __init__(self, ranges, time_key=None):
+        self.time_key = time_key
+        self._boundaries = [params['end_time'] for params in ranges[:-1]]
+        self._index = -1
+        self._start = self._end = None
+        self._previous = set()
+        self._current = set()
+
+    def next_range(self):
+        self._index += 1
+        self._start = self._boundaries[self._index - 1] if self._index > 0 else None
+        self._end = self._boundaries[self._index] if self._index < len(self._boundaries) else None
+        self._previous, self._current = self._current, set()
+
+    def is_new(self, record):
+        if self._start is None and self._end is None:
+            return True
+        second = record_second(record.get(self.time_key)) if self.time_key else None
+        at_start = second is None or second == self._start
+        at_end = second is None or second == self._end
+        if not (at_start or at_end):
+            return True
+        # Keep a short digest rather than the record to bound memory
+        key = hashlib.blake2b(dump_json(record), digest_size=16).digest()
+        if at_end:
+            self._current.add(key)
+        return not (at_start and key in self._previous)
+
+
 class VerkadaAuthenticationError(Exception):
     """Exception for authentication errors"""
     pass
@@ -46,110 +261,157 @@ class VerkadaConnectionError(Exception):
 
 # Create a mock response object with the aggregated data
 class MockResponse:
+    __slots__ = ('status_code', 'headers', 'reason', 'url', '_data')
+
     def __init__(self, original_response, new_data):
-        self._original = original_response
+        self.status_code = original_response.status_code
+        self.headers = original_response.headers
+        self.reason = original_response.reason
+        self.url = original_response.url
         self._data = new_data
         
     def json(self):
         return self._data
-        
-    # Delegate other attributes to original response
-    def __getattr__(self, name):
-        return getattr(self._original, name)
+
+class FullJitterRetry(Retry):
+    """urllib3 Retry policy whose backoff between attempts is backoff_time()"""
+
+    def get_backoff_time(self):
+        # Only count the latest run of consecutive errors, ignoring redirects
+        attempt = len(list(takewhile(
+            lambda history: history.redirect_location is None, reversed(self.history))))
+        return backoff_time(attempt) if attempt else 0
+
 
 class VerkadaSession:
     """Session class for handling HTTP requests with retries and error handling"""
 
     def __init__(self, timeout=DEFAULT_SESSION_TIMEOUT):
-        self.session = requests.Session()
         self.timeout = timeout
         self.max_retries = MAX_RETRIES
+        self.max_workers = DEFAULT_MAX_WORKERS
+        self.session = requests.Session()
+        retry = FullJitterRetry(total=self.max_retries,
+                                status_forcelist=RETRY_STATUS_CODES,
+                                allowed_methods=frozenset({"GET", "POST"}),
+                                respect_retry_after_header=True,
+                                raise_on_status=False)
+        # Keep TCP+TLS connections alive across calls instead of the default 10-connection pool
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                              pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers["Connection"] = "keep-alive"
+        # Advertise every encoding urllib3 can decode here, including br when brotli is installed
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self._pool_logged = False
+        # Called on 401 with the rejected x-verkada-auth token to obtain a new one, set by VerkadaAPI
+        self.token_provider: Optional[Callable[[str], str]] = None
+        self._token_lock = threading.Lock()
 
     def request(self, method, url, **kwargs):
-        retries = self.max_retries
-        last_exception = None
+        """
+        Make a request, retrying rate limits, server errors and connection
+        errors with backoff via the mounted urllib3 Retry policy, and
+        connections lost while reading the body in _send().
+        A 401 on a token-authenticated request refreshes the token through
+        token_provider and replays the request once.
+        """
+        response = self._send(method, url, **kwargs)
+        if response.status_code == 401 and self._can_refresh_token(response):
+            logger.info("Token expired, refreshing token and replaying request")
+            # Read the (small) error body so the replay reuses the same pooled
+            # connection; closing an unread streamed response drops the socket
+            response.content
+            response.close()
+            token = self.refresh_token(response.request.headers['x-verkada-auth'])
+            self._replace_token(kwargs, self.session.headers, token)
+            response = self._send(method, url, **kwargs)
+
+        status = response.status_code
+        if 200 <= status < 300:
+            logger.debug("Request successful: %s", status)
+            self._log_pool(response)
+            return response
+        handler = self._STATUS_HANDLERS.get(status, VerkadaSession._handle_error)
+        raise handler(self, response, method, url)
 
-        while retries > 0:
+    # Error handlers for non-2xx responses, looked up by status in request().
+    # Each returns the exception for request() to raise.
+
+    def _handle_token_expired(self, response, method, url):
+        return VerkadaTokenExpiredError(f"Token expired")
+
+    def _handle_authentication_error(self, response, method, url):
+        return VerkadaAuthenticationError(
+            f"Authentication error: Bad API key or token")
+
+    def _handle_retries_exhausted(self, response, method, url):
+        return VerkadaConnectionError(
+            f"Request failed after {self.max_retries} retries: {response.status_code} {response.reason or ''}")
+
+    def _handle_error(self, response, method, url):
+        return VerkadaConnectionError(
+            f"Request failed: {response.status_code} {response.reason or ''} for {method} {url}")
+
+    _STATUS_HANDLERS = {
+        401: _handle_token_expired,
+        409: _handle_authentication_error,
+        **dict.fromkeys(RETRY_STATUS_CODES, _handle_retries_exhausted),
+    }
+
+    def _send(self, method, url, **kwargs):
+        # The urllib3 Retry policy only covers the request and the response
+        # headers; a connection lost while requests reads the body is retried here
+        last_exception = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                wait_time = backoff_time(attempt)
+                logger.info("Retrying in %.1f seconds...", wait_time)
+                time.sleep(wait_time)
+            logger.debug("Making %s request to %s", method, url)
             try:
-                logger.info(
-                    f"Making {method} request to {url} (retries left: {retries})")
-                response = self.session.request(
+                return self.session.request(
                     method=method, url=url, timeout=self.timeout, **kwargs)
-                status = response.status_code
-                reason = response.reason if response.reason else ''
-
-                # Handle response
-                if 200 <= status < 300:
-                    logger.info(f"Request successful: {status}")
-                    return response
-                if status == 401:
-                    raise VerkadaTokenExpiredError(f"Token expired")
-                elif status == 409:
-                    raise VerkadaAuthenticationError(
-                        f"Authentication error: Bad API key or token")
-                elif status == 429:
-                    logger.warning(
-                        f"Rate limit hit, waiting {RETRY_WAIT_TIME} seconds...")
-                    time.sleep(RETRY_WAIT_TIME)
-                    retries -= 1
-                    continue
-                elif 500 <= status:
-                    logger.warning(
-                        f"Server error {status} {reason} for {method} {url}")
-                    retries -= 1
-                    if retries > 0:
-                        wait_time = (self.max_retries - retries) * \
-                            RETRY_WAIT_TIME  # Exponential backoff
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    continue
-                elif 400 <= status < 500:
-                    logger.warning(
-                        f"Client error {status} {reason} for {method} {url}")
-                    retries -= 1
-                    if retries > 0:
-                        wait_time = (self.max_retries - retries) * \
-                            RETRY_WAIT_TIME
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    continue
-
             except (ConnectionError, Timeout) as e:
+                raise VerkadaConnectionError(
+                    f"Failed to connect after {self.max_retries} retries: {e}") from e
+            except (ChunkedEncodingError, ContentDecodingError) as e:
                 last_exception = e
-                logger.warning(f"Connection error: {e}")
-                retries -= 1
-                if retries > 0:
-                    wait_time = (self.max_retries - retries) * \
-                        RETRY_WAIT_TIME  # Exponential backoff
-                    logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                continue
-            except RequestException as e:
-                last_exception = e
-                logger.warning(f"Request error: {e}")
-                retries -= 1
-                if retries > 0:
-                    wait_time = (self.max_retries - retries) * RETRY_WAIT_TIME
-                    logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                continue
-            except VerkadaTokenExpiredError as e:
-                logger.error(f"Token expired: {e}")
-                logger.info("Refreshing token")
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                raise e
+                logger.warning("Connection error while reading response body: %s", e)
+        raise VerkadaConnectionError(
+            f"Failed to read response after {self.max_retries} retries: {last_exception}") from last_exception
 
-        # If we get here, all retries failed
-        if last_exception:
-            if isinstance(last_exception, (ConnectionError, Timeout)):
-                raise VerkadaConnectionError(
-                    f"Failed to connect after {self.max_retries} retries: {last_exception}")
-            else:
-                raise last_exception
+    def _can_refresh_token(self, response):
+        return self.token_provider is not None and 'x-verkada-auth' in response.request.headers
+
+    @staticmethod
+    def _replace_token(kwargs, default_headers, token):
+        """Put `token` where the replayed request will pick it up"""
+        headers = kwargs.get('headers')
+        if headers and 'x-verkada-auth' in headers:
+            headers['x-verkada-auth'] = token
         else:
-            raise VerkadaConnectionError(
-                f"Request failed after {self.max_retries} retries")
+            default_headers['x-verkada-auth'] = token
+
+    def refresh_token(self, stale_token):
+        """
+        Return a token to replace `stale_token`. Refreshes are serialized so
+        concurrent requests rejected with the same token share one refresh.
+        """
+        with self._token_lock:
+            return self.token_provider(stale_token)
+
+    def _log_pool(self, response):
+        """Log the connection pool size once to confirm keep-alive reuse"""
+        if self._pool_logged or not logger.isEnabledFor(logging.DEBUG):
+            return
+        self._pool_logged = True
+        pool = getattr(response.raw, '_pool', None)
+        if pool is not None:
+            logger.debug("Connection pool for %s: %s connection(s) opened", pool.host, pool.num_connections)
+        logger.debug("Response Content-Encoding: %s", response.headers.get('Content-Encoding'))
 
     def request_pages(self, method, url, **kwargs):
         """
@@ -158,51 +420,377 @@ class VerkadaSession:
         response = self.request(method, url, **kwargs)
         return response
 
-    def request_all_pages(self, method, url, keys, **kwargs):
+    def request_all_pages(self, method, url, keys, filter_fn=None, time_key=None, **kwargs):
+        """
+        Request all pages from a Verkada API endpoint.
+        When both start_time and end_time span more than SHARD_MIN_SECONDS,
+        the time range is split into up to max_workers sub-ranges whose pages
+        are requested concurrently; results are merged in ascending sub-range
+        order, without the duplicates at their shared boundaries.
+        If `filter_fn` is given, only items for which it returns True are kept.
+        `time_key` names the items' time field, see SubRangeDeduplicator.
+        """
+        params = kwargs.pop('params', None) or {}
+        ranges = self._split_params(params, self.max_workers)
+        if len(ranges) == 1:
+            return self._request_page_chain(method, url, keys, filter_fn, params=params, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(self._request_page_chain, method, url, keys, filter_fn,
+                                params=sub_params, **kwargs)
+                for sub_params in ranges
+            ]
+            results = [future.result() for future in futures]
+        data = {k: [] for k in keys}
+        deduplicators = {k: SubRangeDeduplicator(ranges, time_key) for k in keys}
+        for result in results:
+            for k in keys:
+                deduplicators[k].next_range()
+                data[k].extend(item for item in result.json()[k] if deduplicators[k].is_new(item))
+        return MockResponse(results[-1], data)
+
+    @staticmethod
+    def _split_params(params, parts):
         """
-        Request all pages from a Verkada API endpoint
+        Query params for each sub-range of params' start_time/end_time,
+        or just [params] if the range is open or too short to split
         """
-        data = {}
+        start_time, end_time = params.get('start_time'), params.get('end_time')
+        if start_time is None or end_time is None or parts <= 1:
+            return [params]
+        return [{**params, 'start_time': start, 'end_time': end}
+                for start, end in split_time_range(start_time, end_time, parts)]
+
+    def _request_page_chain(self, method, url, keys, filter_fn=None, params=None, **kwargs):
+        """
+        Request all pages of a single query by following next_page_token
+        """
+        # Copy once so following next_page_token never mutates the caller's params
+        params = dict(params or {})
+        data = {k: [] for k in keys}
         number_of_pages = 0
         next_page_token = None
-        for k in keys:
-            data[k] = []
         while next_page_token or number_of_pages == 0:
             number_of_pages += 1
-            logging.info(f"Requesting page {next_page_token}")
-            kwargs['params']['page_token'] = next_page_token
-            response = self.request(method, url, **kwargs)
-            next_page_token = response.json()['next_page_token']
+            logger.debug("Requesting page %s", next_page_token)
+            params['page_token'] = next_page_token
+            response = self.request(method, url, params=params, **kwargs)
+            body = parse_json(response)
+            next_page_token = body['next_page_token']
             for k in keys:
-                data[k].extend(response.json()[k])
-        logger.info(f"Number of pages retrieved: {number_of_pages}")
-        for k in keys:
-            response.json()[k] = data[k]
+                items = body[k]
+                if filter_fn is not None:
+                    items = [item for item in items if filter_fn(item)]
+                data[k].extend(items)
+        logger.info("Number of pages retrieved: %s", number_of_pages)
         return MockResponse(response, data)
 
+    def request_all_pages_iter(self, method, url, key, filter_fn=None, time_key=None, **kwargs):
+        """
+        Request all pages from a Verkada API endpoint, yielding the items of
+        `key` as their pages arrive instead of aggregating them in memory.
+        Long time ranges are split into sub-ranges requested concurrently as
+        in request_all_pages; items are still yielded in ascending sub-range
+        order, while each later sub-range buffers at most SHARD_BUFFERED_PAGES
+        pages ahead of the consumer. `time_key` is as in request_all_pages.
+        """
+        params = kwargs.pop('params', None) or {}
+        ranges = self._split_params(params, self.max_workers)
+        if len(ranges) == 1:
+            for page in self.iter_pages(method, url, key, filter_fn, params=params, **kwargs):
+                yield from page
+            return
+
+        deduplicator = SubRangeDeduplicator(ranges, time_key)
+        done = object()
+        stop = threading.Event()
+
+        def put(pages, item):
+            # Wait for room while the consumer is behind, unless it has quit
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce(pages, sub_params):
+            try:
+                for page in self.iter_pages(method, url, key, filter_fn, params=sub_params, **kwargs):
+                    if not put(pages, page):
+                        return
+                put(pages, done)
+            except Exception as e:
+                put(pages, e)
+
+        queues = [queue.Queue(maxsize=SHARD_BUFFERED_PAGES) for _ in ranges]
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            try:
+                for pages, sub_params in zip(queues, ranges):
+                    executor.submit(produce, pages, sub_params)
+                for pages in queues:
+                    deduplicator.next_range()
+                    while (page := pages.get()) is not done:
+                        if isinstance(page, Exception):
+                            raise page
+                        yield from filter(deduplicator.is_new, page)
+            finally:
+                # Let producers stop after their current page if the consumer quits early
+                stop.set()
+
+    def iter_pages(self, method, url, key, filter_fn=None, **kwargs):
+        """
+        Request pages from a Verkada API endpoint one at a time,
+        yielding the `key` list of each page as soon as it arrives.
+        If `filter_fn` is given, only items for which it returns True are kept.
+        """
+        params = dict(kwargs.pop('params', None) or {})
+        number_of_pages = 0
+        while True:
+            number_of_pages += 1
+            response = self.request(method, url, params=params, **kwargs)
+            body = parse_json(response)
+            items = body[key]
+            if filter_fn is not None:
+                items = [item for item in items if filter_fn(item)]
+            yield items
+            next_page_token = body.get('next_page_token')
+            if not next_page_token:
+                break
+            params['page_token'] = next_page_token
+        logger.info("Number of pages retrieved: %s", number_of_pages)
+
+    def fetch_pages_parallel(self, method, url, page_tokens, max_workers=DEFAULT_MAX_WORKERS, **kwargs):
+        """
+        Request the pages for already known page tokens concurrently on a
+        thread pool sharing this session's connection pool.
+
+        Yields:
+            (page_token, response) tuples in completion order
+        """
+        params = kwargs.pop('params', None) or {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.request, method, url,
+                                params=clean_params({**params, 'page_token': page_token}), **kwargs): page_token
+                for page_token in page_tokens
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def stream_pages(self, method, url, key, filter_fn=None, **kwargs):
+        """
+        Request all pages from a Verkada API endpoint, parsing each body
+        while it downloads and yielding the elements of `key` one by one
+        """
+        params = dict(kwargs.pop('params', None) or {})
+        while True:
+            next_page_token = yield from self._stream_page(method, url, key, filter_fn, params, **kwargs)
+            if not next_page_token:
+                break
+            params['page_token'] = next_page_token
+
+    def _stream_page(self, method, url, key, filter_fn, params, **kwargs):
+        """
+        Yield the elements of `key` of a single page as they are parsed and
+        return its next_page_token. If the connection is lost mid-body, the
+        page is requested again, skipping the elements already parsed.
+        """
+        parsed = 0
+        last_exception = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                wait_time = backoff_time(attempt)
+                logger.info("Retrying in %.1f seconds...", wait_time)
+                time.sleep(wait_time)
+            response = self.request(method, url, params=params, stream=True, **kwargs)
+            try:
+                response.raw.decode_content = True
+                items = iter_json_items(response.raw, key)
+                index = 0
+                while True:
+                    try:
+                        item = next(items)
+                    except StopIteration as stop:
+                        return stop.value
+                    index += 1
+                    if index > parsed:
+                        parsed = index
+                        if filter_fn is None or filter_fn(item):
+                            yield item
+            except (ProtocolError, DecodeError) as e:
+                last_exception = e
+                logger.warning("Connection error while reading response body: %s", e)
+            finally:
+                response.close()
+        raise VerkadaConnectionError(
+            f"Failed to read response after {self.max_retries} retries: {last_exception}") from last_exception
+
+    def async_client(self):
+        """
+        Create an HTTP/2 capable httpx.AsyncClient to share across async requests
+        """
+        if httpx is None:
+            raise ImportError("httpx is required for the async API: pip install 'httpx[http2]'")
+        if not HTTP2_AVAILABLE:
+            logger.warning("h2 is not installed, async requests will use HTTP/1.1")
+        limits = httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                              max_keepalive_connections=ASYNC_MAX_KEEPALIVE_CONNECTIONS)
+        return httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=self.timeout, limits=limits,
+                                 headers=DEFAULT_HEADERS)
+
+    async def request_async(self, client, method, url, **kwargs):
+        """
+        Async counterpart of request() using an httpx.AsyncClient
+        """
+        last_exception = None
+        token_refreshed = False
+        retry_after = None
+
+        # One initial attempt plus max_retries retries, the same budget as the
+        # urllib3 Retry policy of the synchronous session
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                wait_time = backoff_time(attempt, retry_after)
+                logger.info("Retrying in %.1f seconds...", wait_time)
+                await asyncio.sleep(wait_time)
+            try:
+                logger.debug("Making async %s request to %s (attempt %s)", method, url, attempt + 1)
+                response = await client.request(method, url, **kwargs)
+                if (response.status_code == 401 and not token_refreshed
+                        and self._can_refresh_token(response)):
+                    # Replaying with a new token does not use up a retry, as in request()
+                    logger.info("Token expired, refreshing token and replaying request")
+                    token_refreshed = True
+                    token = await asyncio.to_thread(
+                        self.refresh_token, response.request.headers['x-verkada-auth'])
+                    self._replace_token(kwargs, client.headers, token)
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                last_exception = e
+                retry_after = None
+                logger.warning("Connection error: %s", e)
+                continue
+
+            status = response.status_code
+            if 200 <= status < 300:
+                logger.debug("Request successful: %s (%s)", status, response.http_version)
+                return response
+            if status == 401:
+                raise VerkadaTokenExpiredError(f"Token expired")
+            elif status == 409:
+                raise VerkadaAuthenticationError(
+                    f"Authentication error: Bad API key or token")
+            elif status not in RETRY_STATUS_CODES:
+                raise VerkadaConnectionError(
+                    f"Request failed: {status} {response.reason_phrase} for {method} {url}")
+            logger.warning("Error %s %s for %s %s", status, response.reason_phrase, method, url)
+            last_exception = None
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+        if last_exception:
+            raise VerkadaConnectionError(
+                f"Failed to connect after {self.max_retries} retries: {last_exception}")
+        raise VerkadaConnectionError(
+            f"Request failed after {self.max_retries} retries: {status} {response.reason_phrase}")
+
+    async def iter_pages_async(self, client, semaphore, method, url, key, params, filter_fn=None, **kwargs):
+        """
+        Follow next_page_token for a single query, yielding each page's `key` list
+        """
+        next_page_token = None
+        while True:
+            page_params = dict(params)
+            if next_page_token:
+                page_params['page_token'] = next_page_token
+            async with semaphore:
+                response = await self.request_async(
+                    client, method, url, params=page_params, **kwargs)
+            body = parse_json(response)
+            items = body[key]
+            if filter_fn is not None:
+                items = [item for item in items if filter_fn(item)]
+            yield items
+            next_page_token = body.get('next_page_token')
+            if not next_page_token:
+                break
+
+    async def request_all_pages_async(self, client, method, url, key, filter_fn=None, time_key=None, **kwargs):
+        """
+        Async counterpart of request_all_pages_iter(). Long time ranges are
+        split into up to ASYNC_MAX_CONCURRENCY sub-ranges whose page chains
+        are fetched concurrently. Rows of the first sub-range are yielded as
+        their pages arrive; each later sub-range fetches in the background,
+        buffering at most SHARD_BUFFERED_PAGES pages ahead of the consumer.
+        `time_key` is as in request_all_pages.
+        """
+        params = kwargs.pop('params', None) or {}
+        params_list = self._split_params(params, ASYNC_MAX_CONCURRENCY)
+        deduplicator = SubRangeDeduplicator(params_list, time_key)
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+        done = object()
+
+        def iter_pages(params):
+            return self.iter_pages_async(
+                client, semaphore, method, url, key, params, filter_fn, **kwargs)
+
+        async def produce(pages, params):
+            try:
+                async for page in iter_pages(params):
+                    await pages.put(page)
+                await pages.put(done)
+            except Exception as e:
+                await pages.put(e)
+
+        queues = [asyncio.Queue(maxsize=SHARD_BUFFERED_PAGES) for _ in params_list[1:]]
+        tasks = [asyncio.ensure_future(produce(pages, params))
+                 for pages, params in zip(queues, params_list[1:])]
+        try:
+            deduplicator.next_range()
+            async for page in iter_pages(params_list[0]):
+                for row in page:
+                    if deduplicator.is_new(row):
+                        yield row
+            for pages in queues:
+                deduplicator.next_range()
+                while (page := await pages.get()) is not done:
+                    if isinstance(page, Exception):
+                        raise page
+                    for row in page:
+                        if deduplicator.is_new(row):
+                            yield row
+        finally:
+            # Cancelling also wakes producers waiting for room in a full queue
+            for task in tasks:
+                task.cancel()
+
 
 class VerkadaAPI():
+    # Tokens shared by every client in this process, keyed by a hash of the API key
+    _token_cache: Dict[str, Dict[str, Any]] = {}
+
     def __init__(self, api_key=None):
         self.api_key = None
         self.token = None
+        self.token_exp = None
+        self._token_mtime = None
         self.session = VerkadaSession()
-        self.timestamp = None
+        self._api_key_headers = {}
+        self._auth_headers = {}
 
         if not api_key and not os.environ.get(VERKADA_ENVIRONMENT_VARIABLE_API_KEY):
             logger.error("API key not found")
             return
         self.api_key = api_key or os.environ.get(
             VERKADA_ENVIRONMENT_VARIABLE_API_KEY)
-        
+        # The token endpoint authenticates with the API key only, never with a token
+        self._api_key_headers = {"x-api-key": self.api_key, "x-verkada-auth": None}
+        self.session.token_provider = self._provideToken
 
-        self._readToken()
         try:
-            if not self.token:
-                token = self._refreshToken()
-        except VerkadaTokenExpiredError as e:
-            logger.error(f"Token expired during authentication: {e}")
-            token = self._refreshToken()
-            self.token = token
+            self._ensureToken()
         except VerkadaConnectionError as e:
             logger.error(f"Connection error during authentication: {e}")
             raise
@@ -213,27 +801,102 @@ class VerkadaAPI():
             logger.error(f"Unexpected error during authentication: {e}")
             raise
 
+    def _cacheKey(self):
+        return hashlib.sha256((self.api_key or "").encode()).hexdigest()
+
+    def _setToken(self, token, exp):
+        self.token = token
+        self.token_exp = exp
+        self._auth_headers = {"x-verkada-auth": token}
+        # Sync requests pick the token up from the session defaults
+        self.session.session.headers["x-verkada-auth"] = token
+        self._token_cache[self._cacheKey()] = {'token': token, 'exp': exp}
+
+    def _isTokenFresh(self):
+        """Check whether the current token is usable without a refresh"""
+        return bool(self.token) and time.time() < self.token_exp - TOKEN_REFRESH_MARGIN
+
+    def _ensureToken(self):
+        """Load a cached token, refreshing it if it is missing or about to expire"""
+        if self._isTokenFresh():
+            return
+        # Serialized with 401 refreshes, so concurrent callers share one refresh
+        with self.session._token_lock:
+            if self._isTokenFresh():
+                return
+            self._readToken()
+            if not self._isTokenFresh():
+                logger.info("Token missing or expired, refreshing token")
+                self._refreshToken()
+
+    def _provideToken(self, stale_token):
+        """Token provider for VerkadaSession, called when a request returns 401"""
+        if self.token != stale_token and self._isTokenFresh():
+            # Already refreshed by a concurrent request
+            return self.token
+        self._refreshToken()
+        return self.token
+
     def _refreshToken(self):
         res = self.postLoginApiKeyViewV2()
-        self.token = res.json()['token']
-        self.timestamp = int(time.time())
-        with open('token.json', 'w') as f:
-            f.write(json.dumps({'token': self.token, 'timestamp': self.timestamp}))
-        logger.info("Token refreshed and saved to token.json")
+        token = parse_json(res)['token']
+        self._setToken(token, jwt_expiry(token) or int(time.time()) + TOKEN_VALID_SECONDS)
+        # Write to a private temporary file and rename it so readers never see a partial token
+        # (mkstemp creates it with 0600 permissions and a name unique to this process)
+        token_dir, token_name = os.path.split(os.path.abspath(TOKEN_FILE))
+        fd, tmp_file = tempfile.mkstemp(dir=token_dir, prefix=f"{token_name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(json.dumps({'token': self.token, 'exp': self.token_exp}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, TOKEN_FILE)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+        self._token_mtime = os.stat(TOKEN_FILE).st_mtime_ns
+        logger.info(f"Token refreshed and saved to {TOKEN_FILE}")
 
     def _readToken(self):
-        logger.info("Reading token from token.json")
-        if not os.path.exists('token.json'):
-            logger.info("Token file not found, creating new token")
-            self._refreshToken()
-        else:
-            with open('token.json', 'r') as f:
+        cached = self._token_cache.get(self._cacheKey())
+        if cached:
+            self._setToken(cached['token'], cached['exp'])
+            if self._isTokenFresh():
+                return
+        try:
+            mtime = os.stat(TOKEN_FILE).st_mtime_ns
+        except FileNotFoundError:
+            logger.info("Token file not found")
+            return
+        if mtime == self._token_mtime:
+            # Unchanged since this client last read or wrote it
+            return
+        logger.info(f"Reading token from {TOKEN_FILE}")
+        try:
+            with open(TOKEN_FILE, 'r') as f:
                 token_data = json.load(f)
-                self.token = token_data.get('token')
-                self.timestamp = token_data.get('timestamp')
-            if self.timestamp < int(time.time()) - DEFAULT_TOKEN_EXPIRATION_TIME * 60:
-                logger.info("Token expired, refreshing token")
-                self._refreshToken()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable token file: {e}")
+            return
+        if not isinstance(token_data, dict):
+            logger.warning("Ignoring malformed token file: expected an object")
+            return
+        token = token_data.get('token')
+        exp = jwt_expiry(token) or token_data.get('exp')
+        timestamp = token_data.get('timestamp')
+        if exp is None and self._isNumber(timestamp):
+            # Token files written before expiry was stored only hold the issue time
+            exp = timestamp + TOKEN_VALID_SECONDS
+        if not (isinstance(token, str) and token) or not self._isNumber(exp):
+            logger.warning("Ignoring malformed token file: missing token or expiry")
+            return
+        self._token_mtime = mtime
+        self._setToken(token, exp)
+
+    @staticmethod
+    def _isNumber(value):
+        # bool is an int subclass, but never a valid timestamp
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
 
     def postLoginApiKeyViewV2(self):
         """
@@ -242,42 +905,113 @@ class VerkadaAPI():
         API Tokens are valid for 30 minutes and cannot be refreshed. Users will need to call the Get API Token endpoint again to retrieve a new Token if their previous one has expired. When making a call using an expired API Token, users will receive a 401 Authentication Error as well as the following error message:
         {'id': '0e2d', 'message': 'Token expired', 'data': None}
         """
-        resource = f'/token'
-        url = f"{DEFAULT_BASE_URL}{resource}"
-        headers = {
-            "x-api-key": f"{self.api_key}",
-            "Content-Type": "application/json",
-        }
-        response = self.session.request('POST', url, headers=headers)
+        response = self.session.request('POST', TOKEN_URL, headers=self._api_key_headers)
         return response
 
     def getAuditLogsViewV1(self,
                            start_time: Optional[int] = None,
                            end_time: Optional[int] = None,
-                           page_size: Optional[int] = DEFAULT_PAGE_SIZE) -> Generator[Dict[str, Any], None, None]:
+                           page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+                           batch: bool = False,
+                           event_names: Optional[Iterable[str]] = None,
+                           stream: bool = False) -> Generator[Union[Dict[str, Any], List[Dict[str, Any]]], None, None]:
         """
         Generator function to retrieve all audit logs across multiple pages.
 
         Args:
             start_time (int, optional): Start of time range as Unix timestamp in seconds.
             end_time (int, optional): End of time range as Unix timestamp in seconds.
-            page_size (int, optional): Number of items per page (1-200, default: 200).
+            page_size (int, optional): Number of items per page (1-200, default: DEFAULT_PAGE_SIZE (100)).
+            batch (bool, optional): Yield each page's list of audit logs instead of
+                individual entries, e.g. for bulk inserts.
+            event_names (iterable of str, optional): Only keep audit logs with one of these
+                event names, discarding the rest page by page.
+            stream (bool, optional): Parse each page with ijson as it downloads, as in
+                stream_audit_logs(). Cannot be combined with batch.
 
         Yields:
-            Individual audit log entries
+            Individual audit log entries, or per-page lists of them if batch is True
         """
+        if stream:
+            if batch:
+                raise ValueError("stream and batch cannot be combined")
+            yield from self.stream_audit_logs(start_time, end_time, page_size, event_names)
+            return
+        self._ensureToken()
         query_params = {'start_time': start_time,
                         'end_time': end_time, 'page_size': page_size}
         clean_query_params = clean_params(query_params)
-        resource = f'/core/v1/audit_log'
-        url = f"{DEFAULT_BASE_URL}{resource}"
-        headers = {
-            "x-verkada-auth": f"{self.token}",
-            "Content-Type": "application/json"
-        }
-        response = self.session.request_all_pages(
-            'GET', url, ['audit_logs'], headers=headers, params=clean_query_params)
-        return response
+        filter_fn = event_filter(event_names)
+        if batch:
+            yield from self.session.iter_pages(
+                'GET', AUDIT_LOG_URL, 'audit_logs', filter_fn, params=clean_query_params)
+        else:
+            yield from self.session.request_all_pages_iter(
+                'GET', AUDIT_LOG_URL, 'audit_logs', filter_fn, time_key='timestamp',
+                params=clean_query_params)
+
+    def stream_audit_logs(self,
+                          start_time: Optional[int] = None,
+                          end_time: Optional[int] = None,
+                          page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+                          event_names: Optional[Iterable[str]] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        Generator function streaming all audit logs across multiple pages.
+        Each page is parsed with ijson as it downloads, so only one audit
+        log is held in memory at a time.
+
+        Args:
+            start_time (int, optional): Start of time range as Unix timestamp in seconds.
+            end_time (int, optional): End of time range as Unix timestamp in seconds.
+            page_size (int, optional): Number of items per page (1-200, default: DEFAULT_PAGE_SIZE (100)).
+            event_names (iterable of str, optional): Only keep audit logs with one of these
+                event names, discarding the rest as they are parsed.
+
+        Yields:
+            Individual audit log entries
+        """
+        self._ensureToken()
+        query_params = {'start_time': start_time,
+                        'end_time': end_time, 'page_size': page_size}
+        filter_fn = event_filter(event_names)
+        yield from self.session.stream_pages(
+            'GET', AUDIT_LOG_URL, 'audit_logs', filter_fn, params=clean_params(query_params))
+
+    async def getAuditLogsViewV1Async(self,
+                                      start_time: Optional[int] = None,
+                                      end_time: Optional[int] = None,
+                                      page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+                                      event_names: Optional[Iterable[str]] = None,
+                                      client=None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Async generator retrieving all audit logs across multiple pages.
+
+        The API only exposes an opaque next_page_token, so pages of a single
+        query cannot be scheduled up front. When start_time and end_time span
+        more than SHARD_MIN_SECONDS, the range is split into up to
+        ASYNC_MAX_CONCURRENCY sub-ranges whose page chains are fetched
+        concurrently.
+
+        Args:
+            start_time (int, optional): Start of time range as Unix timestamp in seconds.
+            end_time (int, optional): End of time range as Unix timestamp in seconds.
+            page_size (int, optional): Number of items per page (1-200, default: DEFAULT_PAGE_SIZE (100)).
+            event_names (iterable of str, optional): Only keep audit logs with one of these
+                event names, discarding the rest page by page.
+            client (httpx.AsyncClient, optional): Client to reuse, one is created if omitted.
+
+        Yields:
+            Individual audit log entries
+        """
+        await asyncio.to_thread(self._ensureToken)
+        query_params = {'start_time': start_time,
+                        'end_time': end_time, 'page_size': page_size}
+        filter_fn = event_filter(event_names)
+        async with nullcontext(client) if client else self.session.async_client() as client:
+            async for audit_log in self.session.request_all_pages_async(
+                    client, 'GET', AUDIT_LOG_URL, 'audit_logs', filter_fn, time_key='timestamp',
+                    headers=self._auth_headers, params=clean_params(query_params)):
+                yield audit_log
 
     def getNotificationsViewV1(self, 
                         start_time: Optional[int] = None,
@@ -294,9 +1028,10 @@ class VerkadaAPI():
             end_time (int, optional): End of time range as Unix timestamp in seconds.
             include_image_url (bool, optional): Flag to include image URLs.
         
-        Returns:
-            List of all alerts of the specified type
+        Yields:
+            Individual notifications
         """
+        self._ensureToken()
         query_params = {
             'start_time': start_time,
             'end_time': end_time,
@@ -305,15 +1040,62 @@ class VerkadaAPI():
             'notification_type': notification_type
         }
         clean_query_params = clean_params(query_params)
-        resource = f'/cameras/v1/alerts'
-        url = f"{DEFAULT_BASE_URL}{resource}"
-        headers = {
-            "x-verkada-auth": f"{self.token}",
-            "Content-Type": "application/json"
+        yield from self.session.request_all_pages_iter(
+            'GET', NOTIFICATIONS_URL, 'notifications', time_key='created', params=clean_query_params)
+
+    async def getNotificationsViewV1Async(self,
+                                          start_time: Optional[int] = None,
+                                          end_time: Optional[int] = None,
+                                          include_image_url: Optional[bool] = False,
+                                          page_size: Optional[int] = DEFAULT_PAGE_SIZE,
+                                          notification_type: Optional[str] = None,
+                                          client=None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Async generator retrieving all notifications across multiple pages,
+        fetching time sub-ranges concurrently like getAuditLogsViewV1Async.
+
+        Args:
+            start_time (int, optional): Start of time range as Unix timestamp in seconds.
+            end_time (int, optional): End of time range as Unix timestamp in seconds.
+            include_image_url (bool, optional): Flag to include image URLs.
+            page_size (int, optional): Number of items per page.
+            notification_type (str, optional): Type of notification to retrieve.
+            client (httpx.AsyncClient, optional): Client to reuse, one is created if omitted.
+
+        Yields:
+            Individual notifications
+        """
+        await asyncio.to_thread(self._ensureToken)
+        query_params = {
+            'start_time': start_time,
+            'end_time': end_time,
+            # httpx would send True as "true" while requests sends "True"
+            'include_image_url': str(include_image_url) if include_image_url is not None else None,
+            'page_size': page_size,
+            'notification_type': notification_type
         }
-        response = self.session.request_all_pages(
-            'GET', url, ['notifications'], headers=headers, params=clean_query_params)
-        return response
+        async with nullcontext(client) if client else self.session.async_client() as client:
+            async for notification in self.session.request_all_pages_async(
+                    client, 'GET', NOTIFICATIONS_URL, 'notifications', time_key='created',
+                    headers=self._auth_headers, params=clean_params(query_params)):
+                yield notification
+
+
+async def fetch_all_async(client, start_time, end_time):
+    """
+    Fetch the interesting audit logs and the notifications concurrently,
+    sharing one HTTP connection pool between both endpoints
+    """
+    async def collect(items):
+        return [item async for item in items]
+
+    async with client.session.async_client() as http_client:
+        return await asyncio.gather(
+            collect(client.getAuditLogsViewV1Async(
+                start_time=start_time, end_time=end_time,
+                event_names=INTERESTED_EVENTS, client=http_client)),
+            collect(client.getNotificationsViewV1Async(
+                start_time=start_time, end_time=end_time, client=http_client)))
 
 
 if __name__ == "__main__":
@@ -328,8 +1110,8 @@ if __name__ == "__main__":
         parser.error('Both --start and --end must be specified together')
 
     # Get current time
-    current_time = datetime.now()
-    logger.info(f"Started at {current_time} ({current_time.timestamp()})")
+    now = int(time.time())
+    logger.info(f"Started at {datetime.fromtimestamp(now)} ({now})")
 
     if args.start is not None and args.end is not None:
         # Use provided start and end times
@@ -337,28 +1119,27 @@ if __name__ == "__main__":
         end_time = args.end
         logger.info(f"Using provided time range")
     else:
-        # Calculate end_time as the most recent 15-minute interval boundary
-        # Round down to the nearest 15-minute mark
-        minutes_past_interval = current_time.minute % CRON_INTERVAL_MINUTES
-        end_time_dt = current_time.replace(second=0, microsecond=0) - timedelta(minutes=minutes_past_interval)
-        end_time = int(end_time_dt.timestamp())
+        # Round down to the most recent 15-minute interval boundary on the
+        # epoch, so local time zone and DST changes cannot shift the window
+        interval = CRON_INTERVAL_MINUTES * 60
+        end_time = (now // interval) * interval
 
         # Calculate start_time as 15 minutes before the end_time
-        start_time_dt = end_time_dt - timedelta(minutes=CRON_INTERVAL_MINUTES)
-        start_time = int(start_time_dt.timestamp())
+        start_time = end_time - interval
 
     logger.info(f"Fetching audit logs from {datetime.fromtimestamp(start_time)} ({start_time}) to {datetime.fromtimestamp(end_time)} ({end_time})")
 
     client = VerkadaAPI()
-    # res = client.getAuditLogsViewV1()
-    res = client.getAuditLogsViewV1(start_time=start_time, end_time=end_time)
-    audit_logs = res.json()['audit_logs']
-    for audit_log in audit_logs:
-        if audit_log['event_name'] in INTERESTED_EVENTS:
-            print(json.dumps(audit_log, indent=4))
-
-    # res = client.getNotificationsViewV1()
-    res = client.getNotificationsViewV1(start_time=start_time, end_time=end_time)
-    notifications = res.json()['notifications']
-    for notification in notifications:
-        print(json.dumps(notification, indent=4))
+    if httpx is not None:
+        audit_logs, notifications = asyncio.run(fetch_all_async(client, start_time, end_time))
+    else:
+        audit_logs = client.getAuditLogsViewV1(start_time=start_time, end_time=end_time, event_names=INTERESTED_EVENTS)
+        notifications = client.getNotificationsViewV1(start_time=start_time, end_time=end_time)
+
+    # Write every record in one go rather than printing (and flushing) each one
+    output = [dump_json(audit_log) for audit_log in audit_logs]
+    output.extend(dump_json(notification) for notification in notifications)
+    if output:
+        output.append(b'')
+        sys.stdout.buffer.write(b'\n'.join(output))
+        sys.stdout.flush()